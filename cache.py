@@ -0,0 +1,79 @@
+"""
+Redis Cache Helpers
+
+Response caching for read-heavy endpoints. Caching is only enabled when
+REDIS_URL is set; without it the decorated endpoints run uncached.
+"""
+
+import hashlib
+import json
+import os
+from functools import wraps
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import Response
+from redis import asyncio as aioredis
+
+# Load environment variables from .env file
+load_dotenv()
+
+cache = None
+
+redis_url = os.getenv("REDIS_URL")
+
+# Seconds to wait on Redis before treating the call as a cache miss
+REDIS_TIMEOUT = 0.5
+
+async def connect_cache():
+    """Open the Redis connection if REDIS_URL is configured"""
+    global cache
+    if redis_url:
+        cache = aioredis.from_url(
+            redis_url,
+            socket_connect_timeout=REDIS_TIMEOUT,
+            socket_timeout=REDIS_TIMEOUT,
+        )
+
+async def close_cache():
+    """Close the Redis connection"""
+    global cache
+    if cache is not None:
+        await cache.aclose()
+        cache = None
+
+async def delete_pattern(pattern: str):
+    """Delete every cached key matching a glob pattern, e.g. "products:*" """
+    if cache is None:
+        return
+    keys = [key async for key in cache.scan_iter(match=pattern)]
+    if keys:
+        await cache.delete(*keys)
+
+def cached(prefix: str, ttl: int = 300):
+    """Cache an endpoint's JSON body in Redis, keyed by prefix + call params"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if cache is None:
+                return await func(*args, **kwargs)
+
+            params = json.dumps(kwargs, sort_keys=True, default=str)
+            key = f"{prefix}:{hashlib.sha1(params.encode()).hexdigest()}"
+            try:
+                body = await cache.get(key)
+            except Exception:
+                # Redis trouble must never take the endpoint down with it
+                body = None
+            if body is not None:
+                return Response(body, media_type="application/json")
+
+            result = await func(*args, **kwargs)
+            body = result.body if isinstance(result, Response) else orjson.dumps(result, default=str)
+            try:
+                await cache.set(key, body, ex=ttl)
+            except Exception:
+                pass
+            return result
+        return wrapper
+    return decorator
@@ -1,50 +1,147 @@
+import asyncio
+import gzip
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import validation_error_definition, validation_error_response_definition
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from typing import List, Optional
 from bson import ObjectId
+from pymongo import IndexModel
 
-from database import db, create_document, get_documents
-from schemas import Product as ProductSchema, Order as OrderSchema, OrderItem as OrderItemSchema, Customer as CustomerSchema
+from database import db, create_document, create_documents, get_documents
+from cache import cached, connect_cache, close_cache, delete_pattern
+from utils.orjson_response import ORJSONResponse
+from schemas import Order as OrderSchema, OrderItem as OrderItemSchema, Customer as CustomerSchema
 
-app = FastAPI(title="MyAutoKit API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_cache()
+    await ensure_indexes()
+    await seed_products_if_empty()
+    try:
+        await refresh_products_cache()
+    except Exception:
+        # The catalog is encoded lazily on the first request instead
+        pass
+    yield
+    await close_cache()
+
+
+app = FastAPI(title="MyAutoKit API", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# Comma-separated list of allowed frontend origins; falls back to local dev only
+cors_origins = tuple(o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip())
+if not cors_origins:
+    cors_origins = ("http://localhost:3000",)
+    logging.getLogger(__name__).warning(
+        "CORS_ORIGINS is not set; only http://localhost:3000 may call this API. "
+        "Set CORS_ORIGINS to your frontend origin(s) in production."
+    )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=cors_origins,
+    allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Shared by the middleware and the pre-compressed product catalog
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
 
 
 # Utilities
-class ProductResponse(BaseModel):
+class ProductListResponse(BaseModel):
     id: str
     title: str
     slug: str
-    description: Optional[str] = None
     price: float
     category: str
     image: Optional[str] = None
-    gallery: Optional[List[str]] = None
     in_stock: bool
     featured: bool
+
+
+class ProductDetailResponse(ProductListResponse):
+    description: Optional[str] = None
+    gallery: Optional[List[str]] = None
     specs: Optional[dict] = None
 
 
-def serialize_doc(doc: dict) -> dict:
-    if not doc:
-        return doc
-    d = doc.copy()
-    if "_id" in d:
-        d["id"] = str(d.pop("_id"))
-    # Convert any nested ObjectIds if present
-    for k, v in list(d.items()):
-        if isinstance(v, ObjectId):
-            d[k] = str(v)
-    return d
+# Mongo projections matching the response models above
+PRODUCT_LIST_FIELDS = {field: 1 for field in ProductListResponse.model_fields if field != "id"}
+PRODUCT_DETAIL_FIELDS = {field: 1 for field in ProductDetailResponse.model_fields if field != "id"}
+
+
+def serialize_product(doc: dict) -> dict:
+    # Product documents hold no nested ObjectIds; rename _id in place
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def serialize_products(docs: list) -> list:
+    # ORJSONResponse stringifies the ObjectId, so only the key needs renaming
+    for doc in docs:
+        doc["id"] = doc.pop("_id")
+    return docs
+
+
+def price_cents(doc: dict) -> int:
+    # price is the single stored price; work in integer cents from here on
+    return round(float(doc.get("price", 0.0)) * 100)
+
+
+# Sample catalog inserted on first run
+SEED_DOCS: tuple[dict, ...] = (
+    {
+        "title": "Neon Drive LED Poster",
+        "slug": "neon-drive-led-poster",
+        "description": "Futuristic neon car silhouette with dynamic glow, perfect for garage or game room.",
+        "price": 89.0,
+        "category": "LED Poster",
+        "image": "https://images.unsplash.com/photo-1542362567-b07e54358753?q=80&w=1200&auto=format&fit=crop",
+        "gallery": [
+            "https://images.unsplash.com/photo-1542362567-b07e54358753?q=80&w=1200&auto=format&fit=crop",
+            "https://images.unsplash.com/photo-1483721310020-03333e577078?q=80&w=1200&auto=format&fit=crop",
+        ],
+        "in_stock": True,
+        "featured": True,
+        "specs": {"size": "24x36 in", "power": "USB-C", "brightness": "Adjustable"},
+    },
+    {
+        "title": "Carbon Wave LED Poster",
+        "slug": "carbon-wave-led-poster",
+        "description": "Matte carbon fibers meet flowing LED accents for a bold, stealthy vibe.",
+        "price": 99.0,
+        "category": "LED Poster",
+        "image": "https://images.unsplash.com/photo-1520975922203-b272b1e4e766?q=80&w=1200&auto=format&fit=crop",
+        "gallery": None,
+        "in_stock": True,
+        "featured": True,
+        "specs": {"size": "18x24 in", "power": "USB-A", "mount": "Magnetic"},
+    },
+    {
+        "title": "Redline Interior Glow Kit",
+        "slug": "redline-interior-glow-kit",
+        "description": "Premium ambient lighting kit with deep red tones inspired by performance interiors.",
+        "price": 59.0,
+        "category": "Car Decor",
+        "image": "https://images.unsplash.com/photo-1511919884226-fd3cad34687c?q=80&w=1200&auto=format&fit=crop",
+        "gallery": None,
+        "in_stock": True,
+        "featured": False,
+        "specs": {"length": "4x 60cm", "modes": 12, "remote": True},
+    },
+)
 
 
 # Seed sample data on first run
@@ -52,59 +149,62 @@ async def seed_products_if_empty():
     try:
         if db is None:
             return
-        count = db["product"].count_documents({})
-        if count == 0:
-            samples: List[ProductSchema] = [
-                ProductSchema(
-                    title="Neon Drive LED Poster",
-                    slug="neon-drive-led-poster",
-                    description="Futuristic neon car silhouette with dynamic glow, perfect for garage or game room.",
-                    price=89.0,
-                    category="LED Poster",
-                    image="https://images.unsplash.com/photo-1542362567-b07e54358753?q=80&w=1200&auto=format&fit=crop",
-                    gallery=[
-                        "https://images.unsplash.com/photo-1542362567-b07e54358753?q=80&w=1200&auto=format&fit=crop",
-                        "https://images.unsplash.com/photo-1483721310020-03333e577078?q=80&w=1200&auto=format&fit=crop",
-                    ],
-                    in_stock=True,
-                    featured=True,
-                    specs={"size": "24x36 in", "power": "USB-C", "brightness": "Adjustable"},
-                ),
-                ProductSchema(
-                    title="Carbon Wave LED Poster",
-                    slug="carbon-wave-led-poster",
-                    description="Matte carbon fibers meet flowing LED accents for a bold, stealthy vibe.",
-                    price=99.0,
-                    category="LED Poster",
-                    image="https://images.unsplash.com/photo-1520975922203-b272b1e4e766?q=80&w=1200&auto=format&fit=crop",
-                    gallery=None,
-                    in_stock=True,
-                    featured=True,
-                    specs={"size": "18x24 in", "power": "USB-A", "mount": "Magnetic"},
-                ),
-                ProductSchema(
-                    title="Redline Interior Glow Kit",
-                    slug="redline-interior-glow-kit",
-                    description="Premium ambient lighting kit with deep red tones inspired by performance interiors.",
-                    price=59.0,
-                    category="Car Decor",
-                    image="https://images.unsplash.com/photo-1511919884226-fd3cad34687c?q=80&w=1200&auto=format&fit=crop",
-                    gallery=None,
-                    in_stock=True,
-                    featured=False,
-                    specs={"length": "4x 60cm", "modes": 12, "remote": True},
-                ),
-            ]
-            for p in samples:
-                create_document("product", p)
+        if await db["product"].estimated_document_count() == 0:
+            # create_documents copies each dict, so SEED_DOCS is never mutated
+            await create_documents("product", SEED_DOCS, ordered=False)
+            await delete_pattern("products:*")
     except Exception:
         # Silently ignore seeding errors to avoid blocking startup
         pass
 
 
-@app.on_event("startup")
-async def on_startup():
-    await seed_products_if_empty()
+async def ensure_indexes():
+    try:
+        if db is None:
+            return
+        await db["product"].create_indexes([
+            IndexModel([("slug", 1)], unique=True),
+            IndexModel([("featured", 1), ("_id", 1)]),
+        ])
+    except Exception:
+        # Index creation is idempotent; a failure here should not block startup
+        pass
+
+
+# Seconds a cached product list is served before it is rebuilt from Mongo
+PRODUCTS_CACHE_TTL = 300
+# Seconds to keep serving the stale catalog after a failed rebuild before retrying
+PRODUCTS_RETRY_DELAY = 30
+
+# Pre-encoded /api/products body, rebuilt by refresh_products_cache()
+_products_bytes: Optional[bytes] = None
+# gzip copy of _products_bytes; None when the body is below GZIP_MIN_SIZE
+_products_gzip: Optional[bytes] = None
+_products_expires_at = 0.0
+_products_lock = asyncio.Lock()
+
+
+def _products_cache_stale() -> bool:
+    return _products_bytes is None or time.monotonic() >= _products_expires_at
+
+
+async def refresh_products_cache(if_stale: bool = False):
+    """Re-encode the product catalog; call after any product write"""
+    global _products_bytes, _products_gzip, _products_expires_at
+    async with _products_lock:
+        # Requests that queued up behind a refresh reuse its result
+        if if_stale and not _products_cache_stale():
+            return
+        try:
+            docs = await get_documents("product", {}, None, PRODUCT_LIST_FIELDS)
+        except Exception:
+            # Back off so queued requests serve the stale bytes instead of retrying Mongo
+            _products_expires_at = time.monotonic() + PRODUCTS_RETRY_DELAY
+            raise
+        body = ORJSONResponse(serialize_products(docs)).body
+        _products_gzip = gzip.compress(body, compresslevel=GZIP_LEVEL) if len(body) >= GZIP_MIN_SIZE else None
+        _products_bytes = body
+        _products_expires_at = time.monotonic() + PRODUCTS_CACHE_TTL
 
 
 @app.get("/")
@@ -112,31 +212,43 @@ def read_root():
     return {"message": "MyAutoKit API is running"}
 
 
-@app.get("/api/products", response_model=List[ProductResponse])
-def list_products():
+@app.get("/api/products", responses={200: {"model": List[ProductListResponse]}})
+async def list_products(request: Request):
     try:
-        docs = get_documents("product", {}, None)
-        return [ProductResponse(**serialize_doc(d)) for d in docs]
+        if _products_cache_stale():
+            try:
+                await refresh_products_cache(if_stale=True)
+            except Exception:
+                # Keep serving the last good catalog while Mongo is unavailable
+                if _products_bytes is None:
+                    raise
+        # GZipMiddleware passes through responses that already set Content-Encoding
+        headers = {"Vary": "Accept-Encoding"}
+        if _products_gzip is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(_products_gzip, media_type="application/json", headers=headers)
+        return Response(_products_bytes, media_type="application/json", headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/products/featured", response_model=List[ProductResponse])
-def featured_products():
+@app.get("/api/products/featured", responses={200: {"model": List[ProductListResponse]}})
+@cached("products:featured", ttl=PRODUCTS_CACHE_TTL)
+async def featured_products():
     try:
-        docs = get_documents("product", {"featured": True}, 8)
-        return [ProductResponse(**serialize_doc(d)) for d in docs]
+        docs = await get_documents("product", {"featured": True}, 8, PRODUCT_LIST_FIELDS)
+        return ORJSONResponse(serialize_products(docs))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/products/{slug}", response_model=ProductResponse)
-def get_product(slug: str):
+@app.get("/api/products/{slug}", response_model=ProductDetailResponse)
+async def get_product(slug: str):
     try:
-        doc = db["product"].find_one({"slug": slug})
+        doc = await db["product"].find_one({"slug": slug}, PRODUCT_DETAIL_FIELDS)
         if not doc:
             raise HTTPException(status_code=404, detail="Product not found")
-        return ProductResponse(**serialize_doc(doc))
+        return ProductDetailResponse(**serialize_product(doc))
     except HTTPException:
         raise
     except Exception as e:
@@ -146,48 +258,118 @@ def get_product(slug: str):
 class OrderCreate(BaseModel):
     items: List[OrderItemSchema]
     customer: CustomerSchema
-    shipping: float = 0.0
+    shipping: float = Field(0.0, ge=0)
+
+
+# Built once at import so each request goes straight to pydantic-core
+_ORDER_TA = TypeAdapter(OrderCreate)
 
+# create_order reads the raw body, so FastAPI can't derive its schema;
+# register OrderCreate, its nested models and the 422 body under components ourselves
+_ORDER_SCHEMA = OrderCreate.model_json_schema(ref_template="#/components/schemas/{model}")
+_ORDER_COMPONENTS = {
+    **_ORDER_SCHEMA.pop("$defs", {}),
+    "OrderCreate": _ORDER_SCHEMA,
+    # create_order raises RequestValidationError itself, so document its 422 body too
+    "ValidationError": validation_error_definition,
+    "HTTPValidationError": validation_error_response_definition,
+}
+_default_openapi = app.openapi
+
+
+def openapi():
+    if app.openapi_schema is None:
+        schema = _default_openapi()
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        for name, definition in _ORDER_COMPONENTS.items():
+            components.setdefault(name, definition)
+    return app.openapi_schema
+
+
+app.openapi = openapi
+
+
+@app.post(
+    "/api/orders",
+    responses={
+        422: {
+            "description": "Validation Error",
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}}},
+        },
+    },
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": {"$ref": "#/components/schemas/OrderCreate"}}},
+            "required": True,
+        },
+    },
+)
+async def create_order(request: Request):
+    try:
+        order = _ORDER_TA.validate_json(await request.body())
+    except ValidationError as e:
+        # Keep FastAPI's usual 422 shape for body validation errors
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
 
-@app.post("/api/orders")
-def create_order(order: OrderCreate):
     # Recalculate totals based on product IDs and quantities
     try:
         if not order.items:
             raise HTTPException(status_code=400, detail="Cart is empty")
 
-        subtotal = 0.0
-        normalized_items = []
-        for it in order.items:
-            # Fetch product price by id
-            try:
-                prod = db["product"].find_one({"_id": ObjectId(it.product_id)})
-            except Exception:
-                prod = None
-            if not prod:
-                raise HTTPException(status_code=400, detail=f"Invalid product: {it.product_id}")
-            price = float(prod.get("price", 0.0))
-            subtotal += price * it.quantity
-            normalized_items.append({
+        # Reject malformed ids before touching Mongo
+        ids = [it.product_id for it in order.items]
+        bad = [i for i in ids if not ObjectId.is_valid(i)]
+        if bad:
+            raise HTTPException(status_code=400, detail=f"Invalid product: {', '.join(bad)}")
+
+        # Fetch all referenced products in a single round-trip
+        oids = [ObjectId(i) for i in ids]
+        cursor = db["product"].find({"_id": {"$in": oids}}, {"title": 1, "price": 1, "image": 1})
+        prods = {p["_id"]: p for p in await cursor.to_list(length=None)}
+        missing = set(oids) - prods.keys()
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Invalid product: {', '.join(sorted(map(str, missing)))}")
+
+        # Accumulate in integer cents; convert to dollars only for storage
+        line_prods = [prods[oid] for oid in oids]
+        unit_cents = [price_cents(prod) for prod in line_prods]
+        # Items skip OrderItem validation below, so check the Mongo-sourced fields here
+        unorderable = [
+            str(prod["_id"])
+            for prod, cents in zip(line_prods, unit_cents)
+            if not isinstance(prod.get("title"), str) or cents < 0
+        ]
+        if unorderable:
+            raise HTTPException(status_code=400, detail=f"Invalid product: {', '.join(unorderable)}")
+        subtotal_cents = sum(cents * it.quantity for it, cents in zip(order.items, unit_cents))
+        normalized_items = [
+            {
                 "product_id": it.product_id,
                 "title": prod.get("title"),
-                "price": price,
+                "price": cents / 100,
                 "quantity": it.quantity,
                 "image": prod.get("image"),
-            })
+            }
+            for it, prod, cents in zip(order.items, line_prods, unit_cents)
+        ]
 
-        shipping = float(order.shipping or 0.0)
-        total = round(subtotal + shipping, 2)
+        shipping_cents = round((order.shipping or 0.0) * 100)
+        subtotal = subtotal_cents / 100
+        shipping = shipping_cents / 100
+        total = (subtotal_cents + shipping_cents) / 100
 
+        # Item fields were checked above, so only the order totals are validated
         order_doc = OrderSchema(
-            items=[OrderItemSchema(**ni) for ni in normalized_items],
+            items=[OrderItemSchema.model_construct(**ni) for ni in normalized_items],
             customer=order.customer,
-            subtotal=round(subtotal, 2),
+            subtotal=subtotal,
             shipping=shipping,
             total=total,
             status="pending",
         )
-        order_id = create_document("order", order_doc)
+        order_id = await create_document("order", order_doc)
         return {"order_id": order_id, "total": total, "status": "pending"}
     except HTTPException:
         raise
@@ -196,7 +378,7 @@ def create_order(order: OrderCreate):
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -212,7 +394,7 @@ def test_database():
             response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -227,4 +409,17 @@ def test_database():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        # uvloop isn't available on Windows
+        loop = "auto"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop=loop,
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
@@ -4,9 +4,12 @@ Database Schemas for MyAutoKit
 Each Pydantic model represents a collection in your MongoDB database.
 Collection name is the lowercase of the class name (e.g., Product -> "product").
 """
-from pydantic import BaseModel, Field, EmailStr
+import re
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+
 class Product(BaseModel):
     """
     Product catalog schema
@@ -32,7 +35,7 @@ class OrderItem(BaseModel):
 
 class Customer(BaseModel):
     name: str
-    email: EmailStr
+    email: str
     phone: Optional[str] = None
     address_line1: str
     address_line2: Optional[str] = None
@@ -41,6 +44,16 @@ class Customer(BaseModel):
     postal_code: str
     country: str
 
+    @field_validator("email")
+    @classmethod
+    def check_email(cls, v: str) -> str:
+        v = v.strip()
+        if not _EMAIL_RE.fullmatch(v):
+            raise ValueError("value is not a valid email address")
+        # Normalize the domain like EmailStr did; the local part is case-sensitive
+        local, domain = v.rsplit("@", 1)
+        return f"{local}@{domain.lower()}"
+
 class Order(BaseModel):
     """
     Orders schema
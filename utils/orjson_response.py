@@ -0,0 +1,23 @@
+"""
+orjson-backed JSON response
+
+Drop-in replacement for Starlette's JSONResponse that renders with orjson.
+bson ObjectIds are stringified by orjson itself, so Mongo documents can be
+passed through without a Python-side conversion pass.
+"""
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)